@@ -26,7 +26,7 @@ def parse(*, url=None, data=None, source, session=None, downloader=None):
     with video, audio and subtitle track objects where available.
 
     :param url: URL of the MPD document.
-    :param data: The MPD document as a string.
+    :param data: The MPD document as a string or bytes.
     :param source: Source tag for the returned tracks.
     :param session: Used for any remote calls, e.g. getting the MPD document from an URL.
         Can be useful for setting custom headers, proxies, etc.
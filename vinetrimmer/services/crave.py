@@ -1,4 +1,6 @@
 import json
+import os
+import time
 import urllib.parse
 
 import click
@@ -7,6 +9,62 @@ from vinetrimmer.objects import TextTrack, Title, Tracks
 from vinetrimmer.services.BaseService import BaseService
 
 
+AXIS_MEDIA_QUERY = """
+query axisMedia($axisMediaId: ID!) {
+    contentData: axisMedia(id: $axisMediaId) {
+        id
+        axisId
+        title
+        originalSpokenLanguage
+        firstPlayableContent {
+            id
+            title
+            axisId
+            path
+            seasonNumber
+            episodeNumber
+        }
+        mediaType
+        firstAirYear
+        seasons {
+            title
+            id
+            seasonNumber
+        }
+    }
+}
+"""
+
+SEASON_QUERY = """
+query season($seasonId: ID!) {
+    axisSeason(id: $seasonId) {
+        episodes {
+            axisId
+            title
+            contentType
+            seasonNumber
+            episodeNumber
+            axisPlaybackLanguages {
+                language
+            }
+        }
+    }
+}
+"""
+
+RESOLVE_PATH_QUERY = """
+query resolvePath($path: String!) {
+    resolvedPath(path: $path) {
+        lastSegment {
+            content {
+                id
+            }
+        }
+    }
+}
+"""
+
+
 class Crave(BaseService):
     """
     Service code for Bell Media's Crave streaming service (https://crave.ca).
@@ -33,6 +91,7 @@ class Crave(BaseService):
         super().__init__(ctx)
         self.parse_title(ctx, title)
 
+
         self.access_token = None
 
         self.configure()
@@ -45,31 +104,7 @@ class Crave(BaseService):
                 "variables": {
                     "axisMediaId": self.title
                 },
-                "query": """
-                query axisMedia($axisMediaId: ID!) {
-                    contentData: axisMedia(id: $axisMediaId) {
-                        id
-                        axisId
-                        title
-                        originalSpokenLanguage
-                        firstPlayableContent {
-                            id
-                            title
-                            axisId
-                            path
-                            seasonNumber
-                            episodeNumber
-                        }
-                        mediaType
-                        firstAirYear
-                        seasons {
-                            title
-                            id
-                            seasonNumber
-                        }
-                    }
-                }
-                """
+                "query": AXIS_MEDIA_QUERY
             }
         ).json()["data"]["contentData"]
         titles = []
@@ -91,22 +126,7 @@ class Crave(BaseService):
                     "variables": {
                         "seasonId": season["id"]
                     },
-                    "query": """
-                    query season($seasonId: ID!) {
-                        axisSeason(id: $seasonId) {
-                            episodes {
-                                axisId
-                                title
-                                contentType
-                                seasonNumber
-                                episodeNumber
-                                axisPlaybackLanguages {
-                                    language
-                                }
-                            }
-                        }
-                    }
-                    """
+                    "query": SEASON_QUERY
                 }
             ).json()["data"]["axisSeason"]["episodes"])
         return [Title(
@@ -133,15 +153,13 @@ class Crave(BaseService):
             package_id=package_id
         )
         r = self.session.get(mpd_url, params={"jwt": self.access_token})
-        try:
-            mpd_data = r.json()
-        except json.JSONDecodeError:
-            mpd_data = r.text
-        else:
+        if "json" in r.headers.get("Content-Type", ""):
+            res = r.json()
             raise Exception(
                 "Crave reported an error when obtaining the MPD Manifest.\n" +
-                f"{mpd_data['Message']} ({mpd_data['ErrorCode']})"
+                f"{res['Message']} ({res['ErrorCode']})"
             )
+        mpd_data = r.content
 
         tracks = Tracks.from_mpd(
             data=mpd_data,
@@ -181,8 +199,7 @@ class Crave(BaseService):
     # Service specific functions
 
     def configure(self):
-        self.log.info(" + Logging in")
-        self.access_token = self.login()
+        self.access_token = self.get_access_token()
         self.log.info(f"Fetching Axis title ID based on provided path: {self.title}")
         axis_id = self.get_axis_id(f"/tv-shows/{self.title}") or self.get_axis_id(f"/movies/{self.title}")
         if not axis_id:
@@ -190,6 +207,31 @@ class Crave(BaseService):
         self.title = axis_id
         self.log.info(f" + Obtained: {self.title}")
 
+    def get_access_token(self):
+        if not self.credentials:
+            raise self.log.exit(" - No credentials provided, unable to log in.")
+        tokens_cache_path = self.get_cache(f"tokens_{self.credentials.sha1}.json")
+        try:
+            with open(tokens_cache_path, encoding="utf-8") as fd:
+                tokens = json.load(fd)
+        except (OSError, ValueError):
+            tokens = None
+        if tokens and tokens.get("exp", 0) > int(time.time()):
+            self.log.info(" + Using cached auth token")
+            return tokens["access_token"]
+        self.log.info(" + Logging in")
+        tokens = self.login()
+        if tokens.get("expires_in"):
+            os.makedirs(os.path.dirname(tokens_cache_path), exist_ok=True)
+            with open(f"{tokens_cache_path}.tmp", "w", encoding="utf-8") as fd:
+                json.dump({
+                    "access_token": tokens["access_token"],
+                    # refresh a minute early so it doesn't expire mid-way through a request
+                    "exp": int(time.time()) + tokens["expires_in"] - 60
+                }, fd)
+            os.replace(f"{tokens_cache_path}.tmp", tokens_cache_path)
+        return tokens["access_token"]
+
     def login(self):
         if not self.credentials:
             raise self.log.exit(" - No credentials provided, unable to log in.")
@@ -207,7 +249,7 @@ class Crave(BaseService):
             }
         )
         try:
-            return r.json()["access_token"]
+            return r.json()
         except json.JSONDecodeError:
             raise ValueError(f"Failed to log in: {r.text}")
 
@@ -219,17 +261,7 @@ class Crave(BaseService):
                 "variables": {
                     "path": path
                 },
-                "query": """
-                query resolvePath($path: String!) {
-                    resolvedPath(path: $path) {
-                        lastSegment {
-                            content {
-                                id
-                            }
-                        }
-                    }
-                }
-                """
+                "query": RESOLVE_PATH_QUERY
             }
         ).json()
         if "errors" in res:
@@ -1,11 +1,55 @@
-import json
-
 import click
 
 from vinetrimmer.objects import Title, Tracks
 from vinetrimmer.services.BaseService import BaseService
 
 
+AXIS_MEDIA_QUERY = """
+query axisMedia($axisMediaId: ID!) {
+    contentData: axisMedia(id: $axisMediaId) {
+        title
+        originalSpokenLanguage
+        mediaType
+        firstAirYear
+        seasons {
+            title
+            id
+            seasonNumber
+        }
+    }
+}
+"""
+
+SEASON_QUERY = """
+query season($seasonId: ID!) {
+    axisSeason(id: $seasonId) {
+        episodes {
+            axisId
+            title
+            contentType
+            seasonNumber
+            episodeNumber
+            axisPlaybackLanguages {
+                language
+            }
+        }
+    }
+}
+"""
+
+RESOLVE_PATH_QUERY = """
+query resolvePath($path: String!) {
+    resolvedPath(path: $path) {
+        lastSegment {
+            content {
+                id
+            }
+        }
+    }
+}
+"""
+
+
 class CTV(BaseService):
     """
     Service code for CTV Television Network's free streaming platform (https://ctv.ca).
@@ -42,21 +86,7 @@ class CTV(BaseService):
                 "variables": {
                     "axisMediaId": self.title
                 },
-                "query": """
-                query axisMedia($axisMediaId: ID!) {
-                    contentData: axisMedia(id: $axisMediaId) {
-                        title
-                        originalSpokenLanguage
-                        mediaType
-                        firstAirYear
-                        seasons {
-                            title
-                            id
-                            seasonNumber
-                        }
-                    }
-                }
-                """
+                "query": AXIS_MEDIA_QUERY
             }
         ).json()["data"]["contentData"]
         titles = []
@@ -68,22 +98,7 @@ class CTV(BaseService):
                     "variables": {
                         "seasonId": season["id"]
                     },
-                    "query": """
-                    query season($seasonId: ID!) {
-                        axisSeason(id: $seasonId) {
-                            episodes {
-                                axisId
-                                title
-                                contentType
-                                seasonNumber
-                                episodeNumber
-                                axisPlaybackLanguages {
-                                    language
-                                }
-                            }
-                        }
-                    }
-                    """
+                    "query": SEASON_QUERY
                 }
             ).json()["data"]["axisSeason"]["episodes"])
         return [Title(
@@ -110,17 +125,14 @@ class CTV(BaseService):
             package_id=package_id
         )
         r = self.session.get(mpd_url)
-        try:
-            mpd_data = r.json()
-        except json.JSONDecodeError:
-            # awesome, probably no error, should be an MPD
-            mpd_data = r.text
-        else:
-            if "ErrorCode" in mpd_data:
+        if "json" in r.headers.get("Content-Type", ""):
+            res = r.json()
+            if "ErrorCode" in res:
                 raise Exception(
                     "CTV reported an error when obtaining the MPD Manifest.\n" +
-                    f"{mpd_data['Message']} ({mpd_data['ErrorCode']})"
+                    f"{res['Message']} ({res['ErrorCode']})"
                 )
+        mpd_data = r.content
 
         tracks = Tracks.from_mpd(
             data=mpd_data,
@@ -154,17 +166,7 @@ class CTV(BaseService):
                 "variables": {
                     "path": f"/shows/{self.title}"
                 },
-                "query": """
-                query resolvePath($path: String!) {
-                    resolvedPath(path: $path) {
-                        lastSegment {
-                            content {
-                                id
-                            }
-                        }
-                    }
-                }
-                """
+                "query": RESOLVE_PATH_QUERY
             }
         ).json()["data"]["resolvedPath"]["lastSegment"]["content"]["id"]
         print(f"Got axis title id: {self.title}")
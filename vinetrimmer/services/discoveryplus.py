@@ -46,8 +46,15 @@ class DiscoveryPlus(BaseService):
                 self.log.critical(f" - {error_message}")
             sys.exit(1)
 
-        page = next(x for x in res["included"] if x["type"] == "page")
-        episodes = [x for x in res["included"] if x["type"] == "video"]
+        page = None
+        episodes = []
+        for x in res["included"]:
+            if x["type"] == "page":
+                page = page or x
+            elif x["type"] == "video" and x["attributes"]["videoType"] != "CLIP":
+                episodes.append(x)
+        if not page:
+            raise self.log.exit(" - Unable to find the show page in the metadata response")
 
         return [Title(
             id_=ep["id"],
@@ -59,7 +66,7 @@ class DiscoveryPlus(BaseService):
             episode_name=ep["attributes"]["name"],
             source=self.ALIASES[0],
             service_data=ep,
-        ) for ep in episodes if ep["attributes"]["videoType"] != "CLIP"]
+        ) for ep in episodes]
 
     def get_tracks(self, title):
         res = self.session.post(self.config["endpoints"]["video_playback_info"], json={
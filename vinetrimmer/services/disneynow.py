@@ -1,5 +1,5 @@
-import hashlib
-from collections import defaultdict
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 
@@ -48,22 +48,27 @@ class DisneyNOW(BaseService):
 
         show = self.session.get(self.config["endpoints"]["show"].format(id=r["show"]["id"])).json()
 
-        for module in show["modules"]:
-            # TODO: Movie support?
-            if module["name"] in ["tilegroup_show_season_multiple", "show_latest_clips"]:
-                r = self.session.get(module["resource"].format(start="0", size="2000")).json()
-                for tile in r.get("tiles", []):
-                    titles.append(Title(
-                        id_=tile["video"]["id"],
-                        type_=Title.Types.TV,
-                        name=tile["video"]["show"]["title"],
-                        season=int(tile["video"]["seasonnumber"]),
-                        episode=int(tile["video"]["episodenumber"]),
-                        episode_name=tile["video"]["title"],
-                        original_lang=tile["video"]["show"]["language"],
-                        source=self.ALIASES[0],
-                        service_data=tile
-                    ))
+        # TODO: Movie support?
+        modules = [x for x in show["modules"] if x["name"] in ["tilegroup_show_season_multiple", "show_latest_clips"]]
+        with ThreadPoolExecutor(max_workers=max(len(modules), 1)) as executor:
+            responses = list(executor.map(
+                lambda module: self.session.get(module["resource"].format(start="0", size="2000")).json(),
+                modules
+            ))
+
+        for r in responses:
+            for tile in r.get("tiles", []):
+                titles.append(Title(
+                    id_=tile["video"]["id"],
+                    type_=Title.Types.TV,
+                    name=tile["video"]["show"]["title"],
+                    season=int(tile["video"]["seasonnumber"]),
+                    episode=int(tile["video"]["episodenumber"]),
+                    episode_name=tile["video"]["title"],
+                    original_lang=tile["video"]["show"]["language"],
+                    source=self.ALIASES[0],
+                    service_data=tile
+                ))
 
         return titles
 
@@ -125,7 +130,7 @@ class DisneyNOW(BaseService):
                 if cc["type"] == "ttml":
                     language = cc.get("language", "en-US")
                     tracks.add(TextTrack(
-                        id_=hashlib.md5(cc["value"].encode()).hexdigest()[0:6],
+                        id_=f"{zlib.crc32(cc['value'].encode()):08x}"[0:6],
                         source=self.ALIASES[0],
                         url=cc["value"],
                         # metadata
@@ -135,21 +140,8 @@ class DisneyNOW(BaseService):
                         sdh=True  # TODO: find out if sub is SDH/CC
                     ))
 
-        video_tracks = defaultdict(list)
-        for video in tracks.videos:
-            video_tracks[(video.extra[0].get("id"), video.bitrate)].append(video)
-        for group in video_tracks.values():
-            group[0].url = list(flatten(x.url for x in group))
-            for track in group[1:]:
-                tracks.videos.remove(track)
-
-        audio_tracks = defaultdict(list)
-        for audio in tracks.audios:
-            audio_tracks[(audio.extra[0].get("id"), audio.bitrate)].append(audio)
-        for group in audio_tracks.values():
-            group[0].url = list(flatten(x.url for x in group))
-            for track in group[1:]:
-                tracks.audios.remove(track)
+        tracks.videos = self.merge_representations(tracks.videos)
+        tracks.audios = self.merge_representations(tracks.audios)
 
         return tracks
 
@@ -167,6 +159,20 @@ class DisneyNOW(BaseService):
 
     # Service specific functions
 
+    @staticmethod
+    def merge_representations(tracks):
+        """
+        Merge tracks of the same representation (same id and bitrate) into the first one found.
+        The URLs of the duplicates are appended to the first track's URL list, in order.
+        """
+        groups = {}
+        for track in tracks:
+            groups.setdefault((track.extra[0].get("id"), track.bitrate), []).append(track)
+        for group in groups.values():
+            group[0].url = list(flatten(x.url for x in group))
+        duplicates = {id(x) for group in groups.values() for x in group[1:]}
+        return [x for x in tracks if id(x) not in duplicates]
+
     def configure(self):
         self.session.headers.update({
             "appversion": self.config["appversion"],
@@ -1,12 +1,15 @@
 import json
+import math
 import os
 import re
+import threading
 import time
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 import m3u8
+from requests.adapters import HTTPAdapter
 
 from vinetrimmer.objects import MenuTrack, Title, Tracks
 from vinetrimmer.services.BaseService import BaseService
@@ -15,6 +18,9 @@ from vinetrimmer.utils.collections import as_list
 from vinetrimmer.utils.io import get_ip_info
 
 
+BITRATE_RE = re.compile(r"(?<=r/composite_)\d+|\d+(?=_complete\.m3u8)")
+
+
 class DisneyPlus(BaseService):
     """
     Service code for Disney's Disney+ streaming service (https://disneyplus.com).
@@ -29,8 +35,14 @@ class DisneyPlus(BaseService):
     """
 
     ALIASES = ["DSNP", "disneyplus", "disney+"]
-    TITLE_RE = r"^(?:https?://(?:www\.)?disneyplus\.com/(?P<type>movies|series)/[a-z0-9-]+/)?(?P<id>[a-zA-Z0-9-]+)"
+    TITLE_RE = re.compile(
+        r"^(?:https?://(?:www\.)?disneyplus\.com/(?P<type>movies|series)/[a-z0-9-]+/)?(?P<id>[a-zA-Z0-9-]+)"
+    )
 
+    VIDEO_CODEC_MAP = {
+        "H264": ["avc"],
+        "H265": ["hvc", "hev", "dvh"]
+    }
     AUDIO_CODEC_MAP = {
         "AAC": ["aac"],
         "EC3": ["eac", "atmos"]
@@ -61,21 +73,29 @@ class DisneyPlus(BaseService):
         self.bamsdk = None
         self.device_token = None
         self.account_tokens = {}
+        self.account_tokens_expiry = 0
+        self.account_tokens_lock = threading.Lock()
+        self.executor = None
+        self.unlimited_codecs = None
 
         self.configure()
 
     def get_titles(self):
         title_type = "Video" if self.movie else "Series"
-        dmc_bundle = getattr(self.bamsdk.content, f"getDmc{title_type}Bundle")(
-            region=self.region,
-            media_id=self.title,
-            access_token=self.device_token
-        )["data"][f"Dmc{title_type}Bundle"]
-        if dmc_bundle[title_type.lower()] is None:
-            raise self.log.exit(
-                " - Disney+ returned no information on this title. "
-                "It might not be available in the account's region."
-            )
+        cache_key = f"dmc_{title_type.lower()}_{self.region}_{self.title}.json"
+        dmc_bundle = self.load_dmc_cache(cache_key)
+        if dmc_bundle is None:
+            dmc_bundle = getattr(self.bamsdk.content, f"getDmc{title_type}Bundle")(
+                region=self.region,
+                media_id=self.title,
+                access_token=self.device_token
+            )["data"][f"Dmc{title_type}Bundle"]
+            if dmc_bundle[title_type.lower()] is None:
+                raise self.log.exit(
+                    " - Disney+ returned no information on this title. "
+                    "It might not be available in the account's region."
+                )
+            self.save_dmc_cache(cache_key, dmc_bundle)
         title_name = [
             x for x in dmc_bundle[title_type.lower()]["texts"]
             if x["field"] == "title" and x["type"] == "full" and x["language"] == "en"
@@ -92,37 +112,36 @@ class DisneyPlus(BaseService):
                 service_data=title
             )
         else:
-            # get data for every episode in every season via looping due to the fact
+            # get data for every episode in every season via paging due to the fact
             # that the api doesn't provide ALL episodes in the initial bundle api call.
             # TODO: The season info returned might also be paged/limited
-            seasons = {s["seasonId"]: [] for s in dmc_bundle["seasons"]["seasons"]}
-            for season in dmc_bundle["seasons"]["seasons"]:
-                sid = season["seasonId"]
-                if self.wanted and not any(x.startswith(f"{season['seasonSequenceNumber']}x") for x in self.wanted):
-                    continue
-                page = 0
-                while len(seasons[sid]) < season["episodes_meta"]["hits"]:
-                    page += 1
-                    seasons[sid].extend(self.bamsdk.content.getDmcEpisodes(
-                        region=self.region,
-                        season_id=sid,
-                        page=page,
-                        access_token=self.device_token
-                    )["data"]["DmcEpisodes"]["videos"])
-            titles = [x for y in seasons.values() for x in y]
+            seasons = [
+                s for s in dmc_bundle["seasons"]["seasons"]
+                if s["episodes_meta"]["hits"] and (
+                    not self.wanted or any(x.startswith(f"{s['seasonSequenceNumber']}x") for x in self.wanted)
+                )
+            ]
+            # the first page of each season tells us how many episodes are returned per page
+            first_pages = list(self.executor.map(lambda s: self.get_episodes(s["seasonId"], page=1), seasons))
+            next_pages = []
+            for season, episodes in zip(seasons, first_pages):
+                page_count = math.ceil(season["episodes_meta"]["hits"] / max(len(episodes), 1))
+                next_pages.append([
+                    self.executor.submit(self.get_episodes, season["seasonId"], page=page)
+                    for page in range(2, page_count + 1)
+                ])
+            titles = [
+                x
+                for episodes, pages in zip(first_pages, next_pages)
+                for x in episodes + [y for page in pages for y in page.result()]
+            ]
             return [Title(
                 id_=self.title,
                 type_=Title.Types.TV,
                 name=title_name,
                 season=t.get("seasonSequenceNumber"),
                 episode=t.get("episodeSequenceNumber"),
-                episode_name=sorted(
-                    [
-                        x for x in t["texts"]
-                        if x["field"] == "title" and x["type"] == "full" and x["sourceEntity"] == "program"
-                    ],
-                    key=lambda x: "" if x["language"].lower().startswith("en") else x["language"]
-                )[0]["content"],
+                episode_name=self.get_episode_name(t["texts"]),
                 source=self.ALIASES[0],
                 service_data=t
             ) for t in titles]
@@ -135,21 +154,20 @@ class DisneyPlus(BaseService):
             device_token=self.device_token,
         )
 
-        tracks = self.get_manifest_tracks(
-            self.get_manifest_url(
-                media_id=title.service_data["mediaMetadata"]["mediaId"],
-                scenario=self.scenario
-            )
-        )
+        media_id = title.service_data["mediaMetadata"]["mediaId"]
+
+        atmos_future = None
+        if not self.scenario.endswith(("-atmos", "~unlimited")):
+            # fetch the H265 Atmos playback payload alongside the main one in case it has no Atmos audio,
+            # it's only checked (and any errors logged) if it ends up being needed
+            atmos_future = self.executor.submit(self.get_playback_payload, media_id, "tv-drm-ctr-h265-atmos")
 
-        if (not any((x.codec or "").startswith("atmos") for x in tracks.audios)
-                and not self.scenario.endswith(("-atmos", "~unlimited"))):
+        tracks = self.get_manifest_tracks(self.get_manifest_url(media_id, self.scenario))
+
+        if atmos_future and not any((x.codec or "").startswith("atmos") for x in tracks.audios):
             self.log.info(" + Attempting to get Atmos audio from H265 manifest")
             atmos_scenario = self.get_manifest_tracks(
-                self.get_manifest_url(
-                    media_id=title.service_data["mediaMetadata"]["mediaId"],
-                    scenario="tv-drm-ctr-h265-atmos"
-                )
+                self.get_manifest_url(media_id, "tv-drm-ctr-h265-atmos", atmos_future.result())
             )
             tracks.audios.extend(atmos_scenario.audios)
             tracks.subtitles.extend(atmos_scenario.subtitles)
@@ -183,7 +201,7 @@ class DisneyPlus(BaseService):
             chapters.append(MenuTrack(
                 number=len(chapters) + 1,
                 title=name,
-                timecode=datetime.utcfromtimestamp(ms / 1000).strftime("%H:%M:%S.%f")[:-3]
+                timecode=MenuTrack.format_duration(ms / 1000)
             ))
         return chapters
 
@@ -211,12 +229,24 @@ class DisneyPlus(BaseService):
             "User-Agent": self.config["bamsdk"]["user_agent"],
             "Origin": "https://www.disneyplus.com"
         })
+        # one worker pool for all concurrent episode and manifest requests, with a pooled connection for each worker
+        max_workers = self.config.get("max_workers", 16)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="DSNP")
+        self.session.mount("https://", HTTPAdapter(
+            pool_maxsize=max_workers,
+            max_retries=self.session.get_adapter("https://").max_retries
+        ))
 
         self.log.info("Preparing")
         if self.range != "SDR" and self.vcodec != "H265":
             # vcodec must be H265 for High Dynamic Range
             self.vcodec = "H265"
             self.log.info(f" + Switched video codec to H265 to be able to get {self.range} dynamic range")
+        if self.config.get("unlimited_scenario") and self.scenario == "tv-drm-ctr":
+            # one ~unlimited manifest has every codec, range and atmos stream, no H265 Atmos manifest needed
+            self.scenario += "~unlimited"
+            # it doesn't filter by codec though, so the video tracks get filtered by the wanted codec instead
+            self.unlimited_codecs = self.VIDEO_CODEC_MAP.get(self.vcodec)
         self.scenario = self.prepare_scenario(self.scenario, self.vcodec, self.range)
         self.log.info(f" + Scenario: {self.scenario}")
 
@@ -339,39 +369,58 @@ class DisneyPlus(BaseService):
         """
         Get an Account Token using Account Credentials and a Device Token, using a Cache store.
         It also refreshes the token if needed.
+        Tokens are also kept in memory until shortly before they expire.
         """
         if not credential:
             raise self.log.exit(" - No credentials provided, unable to log in.")
-        tokens_cache_path = self.get_cache(f"tokens_{self.region}_{credential.sha1}.json")
-        if os.path.isfile(tokens_cache_path):
-            self.log.info(" + Using cached tokens...")
-            with open(tokens_cache_path, encoding="utf-8") as fd:
-                tokens = json.load(fd)
-            if os.stat(tokens_cache_path).st_ctime > (time.time() - tokens["expires_in"]):
-                return tokens
-            # expired
-            self.log.info(" + Refreshing...")
-            tokens = self.refresh_token(
-                device_family=device_family,
-                refresh_token=tokens["refresh_token"],
-                api_key=self.config["device_api_key"]
-            )
-        else:
-            # first time
-            self.log.info(" + Getting new tokens...")
-            tokens = self.create_account_token(
-                device_family=self.config["bamsdk"]["family"],
-                email=credential.username,
-                password=credential.password,
-                device_token=device_token,
-                api_key=self.config["device_api_key"]
-            )
+        if self.account_tokens and time.time() < self.account_tokens_expiry:
+            return self.account_tokens
+        with self.account_tokens_lock:
+            if self.account_tokens and time.time() < self.account_tokens_expiry:
+                # another thread got to it first
+                return self.account_tokens
+            tokens_cache_path = self.get_cache(f"tokens_{self.region}_{credential.sha1}.json")
+            try:
+                with open(tokens_cache_path, encoding="utf-8") as fd:
+                    tokens = json.load(fd)
+            except FileNotFoundError:
+                tokens = None
+            if tokens:
+                self.log.info(" + Using cached tokens...")
+                expiry = tokens.get("issued_at", 0) + tokens["expires_in"] - 60
+                if expiry > time.time():
+                    self.account_tokens = tokens
+                    self.account_tokens_expiry = expiry
+                    return tokens
+                # expired
+                self.log.info(" + Refreshing...")
+                tokens = self.refresh_token(
+                    device_family=device_family,
+                    refresh_token=tokens["refresh_token"],
+                    api_key=self.config["device_api_key"]
+                )
+            else:
+                # first time
+                self.log.info(" + Getting new tokens...")
+                tokens = self.create_account_token(
+                    device_family=self.config["bamsdk"]["family"],
+                    email=credential.username,
+                    password=credential.password,
+                    device_token=device_token,
+                    api_key=self.config["device_api_key"]
+                )
 
-        os.makedirs(os.path.dirname(tokens_cache_path), exist_ok=True)
-        with open(tokens_cache_path, "w", encoding="utf-8") as fd:
-            json.dump(tokens, fd)
+            tokens["issued_at"] = int(time.time())
 
-        return tokens
+            os.makedirs(os.path.dirname(tokens_cache_path), exist_ok=True)
+            # write to a temporary file first so an interrupted write can't leave a truncated cache behind
+            with open(f"{tokens_cache_path}.tmp", "w", encoding="utf-8") as fd:
+                json.dump(tokens, fd)
+            os.replace(f"{tokens_cache_path}.tmp", tokens_cache_path)
+
+            self.account_tokens = tokens
+            self.account_tokens_expiry = tokens["issued_at"] + tokens["expires_in"] - 60
+            return tokens
 
     def create_account_token(self, device_family, email, password, device_token, api_key):
         """
@@ -482,13 +531,79 @@ class DisneyPlus(BaseService):
             raise self.log.exit(f" - Failed! {res['errors'][0]['description']}")
         return res
 
-    def get_manifest_url(self, media_id, scenario):
-        self.log.info(f"Retrieving manifest for {media_id} {scenario}")
-        manifest = self.bamsdk.media.mediaPayload(
+    @staticmethod
+    def get_episode_name(texts):
+        """Get an episode's full program title, preferring English, else the first by language code."""
+        name = None
+        for text in texts:
+            if text["field"] != "title" or text["type"] != "full" or text["sourceEntity"] != "program":
+                continue
+            if text["language"].lower().startswith("en"):
+                return text["content"]
+            if name is None or text["language"] < name["language"]:
+                name = text
+        return name["content"] if name else None
+
+    def get_episodes(self, season_id, page):
+        """Get a page of episodes for a season."""
+        cache_key = f"dmc_episodes_{self.region}_{season_id}_{page}.json"
+        episodes = self.load_dmc_cache(cache_key)
+        if episodes is None:
+            episodes = self.bamsdk.content.getDmcEpisodes(
+                region=self.region,
+                season_id=season_id,
+                page=page,
+                access_token=self.device_token
+            )["data"]["DmcEpisodes"]["videos"]
+            self.save_dmc_cache(cache_key, episodes)
+        return episodes
+
+    def load_dmc_cache(self, key):
+        """
+        Load a cached DMC content API response.
+        Returns None if caching is disabled (the default), or if it isn't cached, is older than
+        `dmc_cache_ttl` seconds, or can't be read.
+        """
+        ttl = self.config.get("dmc_cache_ttl")
+        if not ttl:
+            return None
+        cache_path = self.get_cache(key)
+        if not os.path.isfile(cache_path):
+            return None
+        if os.path.getmtime(cache_path) < time.time() - ttl:
+            return None
+        try:
+            with open(cache_path, encoding="utf-8") as fd:
+                return json.load(fd)
+        except (OSError, ValueError):
+            return None
+
+    def save_dmc_cache(self, key, data):
+        """Save a DMC content API response to the cache, if caching is enabled."""
+        if not self.config.get("dmc_cache_ttl"):
+            return
+        cache_path = self.get_cache(key)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(f"{cache_path}.tmp", "w", encoding="utf-8") as fd:
+            json.dump(data, fd)
+        os.replace(f"{cache_path}.tmp", cache_path)
+
+    def get_playback_payload(self, media_id, scenario):
+        """Get the playback payload of a scenario. Any errors are left in it to be checked by the caller."""
+        return self.bamsdk.media.mediaPayload(
             media_id=media_id,
             scenario=scenario,
             access_token=self.account_tokens["access_token"]
         )
+
+    def get_manifest_url(self, media_id, scenario, manifest=None):
+        """
+        Get the manifest URL of a scenario, exiting if Disney+ returned an error for it.
+        An already retrieved playback payload of the scenario can be passed as `manifest`.
+        """
+        self.log.info(f"Retrieving manifest for {media_id} {scenario}")
+        if manifest is None:
+            manifest = self.get_playback_payload(media_id, scenario)
         if "errors" in manifest:
             if manifest["errors"][0]["code"] == "playback.selection-not-found":
                 raise self.log.exit(f" - No playback manifests for {scenario}")
@@ -498,16 +613,18 @@ class DisneyPlus(BaseService):
         return manifest["stream"]["complete"][0]["url"]
 
     def get_manifest_tracks(self, url):
-        tracks = Tracks.from_m3u8(m3u8.load(url), source=self.ALIASES[0])
+        r = self.session.get(url)
+        tracks = Tracks.from_m3u8(m3u8.loads(r.text, r.url), source=self.ALIASES[0])
+        if self.unlimited_codecs:
+            tracks.videos = [x for x in tracks.videos if (x.codec or "")[:3] in self.unlimited_codecs]
         if self.acodec:
-            tracks.audios = [
-                x for x in tracks.audios if (x.codec or "").split("-")[0] in self.AUDIO_CODEC_MAP[self.acodec]
-            ]
+            codecs = self.AUDIO_CODEC_MAP[self.acodec]
+            tracks.audios = [x for x in tracks.audios if (x.codec or "").split("-", 1)[0] in codecs]
         for video in tracks.videos:
             # This is needed to remove weird glitchy NOP data at the end of stream
             video.needs_repack = True
         for audio in tracks.audios:
-            bitrate = re.search(r"(?<=r/composite_)\d+|\d+(?=_complete.m3u8)", as_list(audio.url)[0])
+            bitrate = BITRATE_RE.search(as_list(audio.url)[0])
             if not bitrate:
                 raise self.log.exit(" - Unable to get bitrate for an audio track")
             audio.bitrate = int(bitrate.group()) * 1000
@@ -518,5 +635,6 @@ class DisneyPlus(BaseService):
             subtitle.codec = "vtt"
             subtitle.forced = subtitle.forced or subtitle.extra.name.endswith("--forced--")
             # sdh might not actually occur, either way DSNP CC == SDH :)
-            subtitle.sdh = "[cc]" in subtitle.extra.name.lower() or "[sdh]" in subtitle.extra.name.lower()
+            name = subtitle.extra.name.lower()
+            subtitle.sdh = "[cc]" in name or "[sdh]" in name
         return tracks
@@ -1,5 +1,7 @@
 import json
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from http.cookiejar import MozillaCookieJar
 
 import click
@@ -24,7 +26,7 @@ class Filmio(BaseService):
 
     ALIASES = ["FMIO", "filmio"]
     #GEOFENCE = ["hu"]
-    TITLE_RE = r"^(?:https?://(?:www\.)?filmio\.hu/details.+id=)?(?P<id>\d+)"
+    TITLE_RE = re.compile(r"^(?:https?://(?:www\.)?filmio\.hu/details.+id=)?(?P<id>\d+)")
 
     @staticmethod
     @click.command(name="Filmio", short_help="https://filmio.hu")
@@ -38,14 +40,27 @@ class Filmio(BaseService):
         self.parse_title(ctx, title)
 
         self.profile = ctx.obj.profile
+        self.executor = ThreadPoolExecutor(max_workers=1)
 
         self.configure()
 
+        # start fetching the metadata now, so it's ready (or closer to it) by the time titles are needed
+        self.metadata_request = self.executor.submit(
+            self.session.get, self.config["endpoints"]["metadata"].format(title_id=self.title)
+        )
+
     def get_titles(self, retrying=False):
+        metadata_request, self.metadata_request = self.metadata_request, None
+        if metadata_request:
+            # nothing else is submitted to the executor, shutting it down still lets the request finish
+            self.executor.shutdown(wait=False)
         try:
-            r = self.session.get(
-                self.config["endpoints"]["metadata"].format(title_id=self.title)
-            )
+            if metadata_request:
+                r = metadata_request.result()
+            else:
+                r = self.session.get(
+                    self.config["endpoints"]["metadata"].format(title_id=self.title)
+                )
         except requests.HTTPError as e:
             if e.response.status_code == 401 and not retrying:
                 self.log.warning(" - Cookies expired or invalid, logging in again...")
@@ -75,11 +90,14 @@ class Filmio(BaseService):
             year=res["title"]["year"],
             original_lang=Language.get(next(iter(res["originalLanguages"][0]))),
             source=self.ALIASES[0],
-            service_data=r
+            service_data={
+                "metadata": res,
+                "drmtoken": r.headers.get("drmtoken")
+            }
         )
 
     def get_tracks(self, title):
-        res = title.service_data.json()
+        res = title.service_data["metadata"]
 
         tracks = Tracks.from_mpd(
             url=res["movie"]["contentUrl"],
@@ -103,7 +121,7 @@ class Filmio(BaseService):
 
     def license(self, *, challenge, title, **_):
         r = self.session.post(self.config["endpoints"]["license"], params={
-            "drmToken": title.service_data.headers["drmtoken"]
+            "drmToken": title.service_data["drmtoken"]
         }, data=challenge)
 
         try:
@@ -139,4 +157,5 @@ class Filmio(BaseService):
         for cookie in self.session.cookies:
             cookie_jar.set_cookie(cookie)
         os.makedirs(os.path.dirname(self.cookie_file), exist_ok=True)
-        cookie_jar.save(ignore_discard=True)
+        cookie_jar.save(f"{self.cookie_file}.tmp", ignore_discard=True)
+        os.replace(f"{self.cookie_file}.tmp", self.cookie_file)
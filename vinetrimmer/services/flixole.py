@@ -1,4 +1,5 @@
 import json
+import re
 
 import click
 
@@ -6,6 +7,34 @@ from vinetrimmer.objects import Title, Tracks
 from vinetrimmer.services.BaseService import BaseService
 
 
+VIEWABLE_QUERY = """
+query viewable($viewableId: ID!) {
+    viewer {
+        viewable(magineId: $viewableId) {
+            title
+            ... on Movie {
+                productionYear
+                defaultPlayable {
+                    ... on ChannelPlayable {
+                        id
+                    }
+                    ... on BroadcastPlayable {
+                        id
+                    }
+                    ... on VodPlayable {
+                        id
+                    }
+                    ... on LiveEventPlayable {
+                        id
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+
 class FlixOle(BaseService):
     """
     Service code for FlixOlé streaming service (https://ver.flixole.com/).
@@ -16,7 +45,7 @@ class FlixOle(BaseService):
     """
 
     ALIASES = ["FO", "flixole"]
-    TITLE_RE = r"^(?:https?://ver\.flixole\.com/watch/)?(?P<id>[a-f0-9-]+)"
+    TITLE_RE = re.compile(r"^(?:https?://ver\.flixole\.com/watch/)?(?P<id>[a-f0-9-]+)")
 
     @staticmethod
     @click.command(name="FlixOle", short_help="https://flixole.com")
@@ -43,145 +72,7 @@ class FlixOle(BaseService):
                     "viewableId": f"{self.title}",
                     "broadcastId": "",
                 },
-                "query": """
-                    query viewable($viewableId: ID!) {
-                        viewer {
-                            id: magineId
-                            viewable(magineId: $viewableId) {
-                              __typename
-                              id: magineId
-                              title
-                              description
-                              ...MovieFragment
-                            }
-                          }
-                        }
-
-                        fragment MovieFragment on Movie {
-                          title
-                          banner: image(type: \"sixteen-nine\")
-                          poster: image(type: \"poster\")
-                          metaImage: image(type: \"poster\")
-                          description
-                          duration
-                          durationHuman
-                          genres
-                          productionYear
-                          inMyList
-                          trailer
-                          entitlement {
-                            ...EntitlementFragment
-                          }
-                          defaultPlayable {
-                            ...PlayableFragment
-                          }
-                          providedBy {
-                            brand
-                          }
-                          webview
-                        }
-
-                        fragment EntitlementFragment on EntitlementInterfaceType {
-                          __typename
-                          offer {
-                            ...OfferFragment
-                          }
-                          purchasedAt
-                          ... on EntitlementRentType {
-                            entitledUntil
-                          }
-                          ... on EntitlementPassType {
-                            entitledUntil
-                          }
-                        }
-
-                        fragment OfferFragment on OfferInterfaceType {
-                          __typename
-                          id
-                          title
-
-                          ... on BuyType {
-                            priceInCents
-                            currency
-                            buttonText
-                          }
-
-                          ... on RentType {
-                            priceInCents
-                            currency
-                            buttonText
-                            entitlementDurationSec
-                          }
-
-                          ... on SubscribeType {
-                            priceInCents
-                            currency
-                            buttonText
-                            trialPeriod {
-                              length
-                              unit
-                            }
-                            recurringPeriod {
-                              length
-                              unit
-                            }
-                          }
-
-                          ... on PassType {
-                            priceInCents
-                            currency
-                            buttonText
-                          }
-                        }
-
-                        fragment PlayableFragment on Playable {
-                          ...ChannelPlayableFragment
-                          ...BroadcastPlayableFragment
-                          ...VodPlayableFragment
-                          ...LiveEventPlayableFragment
-                        }
-
-                        fragment ChannelPlayableFragment on ChannelPlayable {
-                          id
-                          kind
-                          mms
-                          mmsOrigCode
-                          rights {
-                            fastForward
-                            pause
-                            rewind
-                          }
-                        }
-
-                        fragment BroadcastPlayableFragment on BroadcastPlayable {
-                          id
-                          kind
-                          channel {
-                            title
-                            logoDark: image(type: \"logo-dark\")
-                          }
-                          startTimeUtc
-                          duration
-                          catchup {
-                            from
-                            to
-                          }
-                          watchOffset
-                        }
-
-                        fragment VodPlayableFragment on VodPlayable {
-                          id
-                          kind
-                          duration
-                          watchOffset
-                        }
-
-                        fragment LiveEventPlayableFragment on LiveEventPlayable {
-                          id
-                          kind
-                          startTimeUtc
-                        }
-                        """
+                "query": VIEWABLE_QUERY
             })
         try:
             res = r.json()["data"]["viewer"]
@@ -1,15 +1,19 @@
 import base64
 import hashlib
 import json
+import os
 import re
 import time
 import uuid
+import zlib
 
 import click
 
 from vinetrimmer.objects import AudioTrack, TextTrack, Title, Tracks, VideoTrack
 from vinetrimmer.services.BaseService import BaseService
-from vinetrimmer.utils import try_get
+
+
+FMT_RE = re.compile(r"&fmt=(\w+)")
 
 
 class GooglePlay(BaseService):
@@ -22,7 +26,7 @@ class GooglePlay(BaseService):
     """
 
     ALIASES = ["PLAY", "googleplay"]
-    TITLE_RE = r"^(?:https?://play\.google\.com/store/(?P<type>movies|tv)/.+id=)(?P<id>[a-zA-Z0-9.]+)"
+    TITLE_RE = re.compile(r"^(?:https?://play\.google\.com/store/(?P<type>movies|tv)/.+id=)(?P<id>[a-zA-Z0-9.]+)")
 
     CODEC_MAP = {
         "H264": "avc1",
@@ -51,13 +55,14 @@ class GooglePlay(BaseService):
 
         self.vcodec = self.CODEC_MAP.get(ctx.parent.params["vcodec"])
         self.acodec = self.CODEC_MAP.get(ctx.parent.params["acodec"])
+        self.profile = ctx.obj.profile
 
         self.asset_type = ""
         self.device_data = []
+        self.client_info = []
         self.video_quality = None
         self.audio_quality = None
         self.hdr_type = None
-        self.stream_id = None
 
         self.configure()
 
@@ -128,13 +133,11 @@ class GooglePlay(BaseService):
             ) for t in res if t["resource_id"]["type"] == "EPISODE" and t["parent"]["id"] in seasons]
 
     def get_tracks(self, title):
-        self.stream_id = title.service_data["resource_id"]["id"]
-
         stream_info = self.session.post(
             url=self.config["endpoints"]["manifest"],
             data=json.dumps([
                 [
-                    self.device_data, ["0.1", 2, 3, "0", 1], ["en", "US"], None,
+                    *self.client_info,
                     [
                         None, [[21760040]], None, None,
                         [
@@ -147,7 +150,8 @@ class GooglePlay(BaseService):
                         ]
                     ]
                 ],
-                [1 if self.movie else 5, self.stream_id], 6, [[1, 2, 4, 5], []], [[1, 2, 3], []], None, None
+                [1 if self.movie else 5, title.service_data["resource_id"]["id"]],
+                6, [[1, 2, 4, 5], []], [[1, 2, 3], []], None, None
             ], separators=(",", ":")),
             headers={
                 "Content-Type": "application/json+protobuf"
@@ -158,60 +162,61 @@ class GooglePlay(BaseService):
             error = stream_info["error"]
             raise self.log.exit(f" - Failed to get track info: {error['message']} [{error['code']}]")
 
-        tracks = []
-
-        for period in stream_info["mpd"]["period"]:
-            for adaptation_set in period["adaptationSet"]:
-                for rep in adaptation_set["representation"]:
-                    language = adaptation_set.get("language")
-                    if adaptation_set["contentType"] == "VIDEO":
-                        if self.vcodec not in rep["codecs"]:
-                            continue
-                        tracks.append(VideoTrack(
-                            id_=rep["id"],
-                            source=self.ALIASES[0],
-                            url=rep["baseUrl"][0],
-                            # metadata
-                            codec=rep["codecs"],
-                            language=language,
-                            bitrate=rep["bandwidth"],
-                            width=rep.get("width"),
-                            height=rep.get("height"),
-                            fps=rep.get("frameRate"),
-                            # decryption
-                            encrypted=len(adaptation_set.get("contentProtection", [])) > 0
-                        ))
-                    elif adaptation_set["contentType"] == "AUDIO":
-                        if self.acodec and self.acodec not in rep["codecs"]:
-                            continue
-                        tracks.append(AudioTrack(
-                            id_=rep["id"],
-                            source=self.ALIASES[0],
-                            url=rep["baseUrl"][0],
-                            # metadata
-                            codec=rep["codecs"],
-                            language=language,
-                            bitrate=rep["bandwidth"],
-                            # decryption
-                            encrypted=len(adaptation_set.get("contentProtection", [])) > 0
-                        ))
-                    else:
-                        continue
-
-            text_map = try_get(stream_info, lambda x: x["timedTexts"]["periodTimedTextMap"][str(period["id"])])
-            if text_map:
-                for sub in text_map["formatTimedTextMap"]["WEB_VTT"]["timedTextEntity"]:
-                    tracks.append(TextTrack(
-                        id_=hashlib.md5(sub["url"].encode()).hexdigest()[0:6],
-                        source=self.ALIASES[0],
-                        url=sub["url"],
-                        # metadata
-                        codec=(re.search(r"&fmt=(\w+)", sub["url"]) or [])[1].split("-")[0],
-                        language=sub["language"],
-                        cc=sub["contentType"] == "CLOSED_CAPTION"  # seems to really be CC, not SDH
-                    ))
-
-        return Tracks(tracks)
+        periods = stream_info["mpd"]["period"]
+        representations = [
+            (adaptation_set, rep)
+            for period in periods
+            for adaptation_set in period["adaptationSet"]
+            # subtitles come from timedTexts, so other adaptation sets have nothing to offer
+            if adaptation_set["contentType"] in ("VIDEO", "AUDIO")
+            for rep in adaptation_set["representation"]
+        ]
+
+        videos = [VideoTrack(
+            id_=rep["id"],
+            source=self.ALIASES[0],
+            url=rep["baseUrl"][0],
+            # metadata
+            codec=rep["codecs"],
+            language=adaptation_set.get("language"),
+            bitrate=rep["bandwidth"],
+            width=rep.get("width"),
+            height=rep.get("height"),
+            fps=rep.get("frameRate"),
+            # decryption
+            encrypted=bool(adaptation_set.get("contentProtection"))
+        ) for adaptation_set, rep in representations if (
+            adaptation_set["contentType"] == "VIDEO" and self.vcodec in rep["codecs"]
+        )]
+
+        audios = [AudioTrack(
+            id_=rep["id"],
+            source=self.ALIASES[0],
+            url=rep["baseUrl"][0],
+            # metadata
+            codec=rep["codecs"],
+            language=adaptation_set.get("language"),
+            bitrate=rep["bandwidth"],
+            # decryption
+            encrypted=bool(adaptation_set.get("contentProtection"))
+        ) for adaptation_set, rep in representations if (
+            adaptation_set["contentType"] == "AUDIO" and (not self.acodec or self.acodec in rep["codecs"])
+        )]
+
+        period_text_maps = stream_info.get("timedTexts", {}).get("periodTimedTextMap", {})
+        text_maps = [period_text_maps.get(str(period["id"])) for period in periods]
+        subtitles = [TextTrack(
+            id_=f"{zlib.crc32(sub['url'].encode()):08x}"[0:6],
+            source=self.ALIASES[0],
+            url=sub["url"],
+            # metadata
+            # entities are from the WEB_VTT map, so assume vtt if the url doesn't say
+            codec=(FMT_RE.search(sub["url"]) or [None, "vtt"])[1].split("-")[0],
+            language=sub["language"],
+            cc=sub["contentType"] == "CLOSED_CAPTION"  # seems to really be CC, not SDH
+        ) for text_map in text_maps if text_map for sub in text_map["formatTimedTextMap"]["WEB_VTT"]["timedTextEntity"]]
+
+        return Tracks(videos, audios, subtitles)
 
     def get_chapters(self, title):
         return []
@@ -220,15 +225,15 @@ class GooglePlay(BaseService):
         # TODO: Hardcode the certificate
         return self.license(**kwargs)
 
-    def license(self, challenge, **_):
+    def license(self, challenge, title, **_):
         res = self.session.post(
             url=self.config["endpoints"]["license"],
             data=json.dumps([
-                [self.device_data, ["0.1", 2, 3, "0", 1], ["en", "US"], None, [None, None, None, ""]],
+                [*self.client_info, [None, None, None, ""]],
                 [
                     [None, None, None],
                     None, None, None, None,
-                    [1 if self.movie else 5, self.stream_id],
+                    [1 if self.movie else 5, title.service_data["resource_id"]["id"]],
                     ""
                 ],
                 [base64.b64encode(challenge).decode("utf-8")]
@@ -247,7 +252,22 @@ class GooglePlay(BaseService):
             "Authorization": self.generate_authorization(),
         })
         self.asset_type = "movie" if self.movie else "episode" if self.episode else "show"
-        self.device_data = ["Nvidia", "	P2897", "Android", "9.0", "TV", str(uuid.uuid4())]  # TODO: Get more device data
+        # TODO: Get more device data
+        self.device_data = ["Nvidia", "	P2897", "Android", "9.0", "TV", self.get_device_id()]
+        # device, client version and locale info that starts every manifest and license request
+        self.client_info = [self.device_data, ["0.1", 2, 3, "0", 1], ["en", "US"], None]
+
+    def get_device_id(self):
+        """Get the profile's device ID, creating and caching a new one if needed."""
+        device_id_path = self.get_cache(f"device_id_{self.profile}.txt")
+        if os.path.isfile(device_id_path):
+            with open(device_id_path, encoding="utf-8") as fd:
+                return fd.read().strip()
+        device_id = str(uuid.uuid4())
+        os.makedirs(os.path.dirname(device_id_path), exist_ok=True)
+        with open(device_id_path, "w", encoding="utf-8") as fd:
+            fd.write(device_id)
+        return device_id
 
     def generate_authorization(self):
         timestamp = int(time.time())
@@ -1,12 +1,16 @@
 import json
-from hashlib import md5
+import os
+import re
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 import requests
 
 from vinetrimmer.objects import TextTrack, Title, Tracks, VideoTrack
 from vinetrimmer.services.BaseService import BaseService
-from vinetrimmer.utils import is_close_match, try_get
+from vinetrimmer.utils import is_close_match
 
 
 class HBOMax(BaseService):
@@ -19,13 +23,13 @@ class HBOMax(BaseService):
 
     \b
     Tips: The library of contents can be viewed without logging in at https://play.hbomax.com
-
-    TODO: Implement token caching to reduce the amount of times the login call is made
     """
 
     ALIASES = ["HMAX", "hbomax"]
    # GEOFENCE = ["us"]
-    TITLE_RE = r"^(?:https?://(?:www\.|play\.)?hbomax\.com/[a-z]+/)?(?P<id>(?:urn:hbo:[a-z]+:)?\w+(?:[\w:-]+))?"
+    TITLE_RE = re.compile(
+        r"^(?:https?://(?:www\.|play\.)?hbomax\.com/[a-z]+/)?(?P<id>(?:urn:hbo:[a-z]+:)?\w+(?:[\w:-]+))?"
+    )
 
     VIDEO_CODEC_MAP = {
         "H264": ["avc1"],
@@ -55,11 +59,13 @@ class HBOMax(BaseService):
         self.acodec = ctx.parent.params["acodec"]
         self.range = ctx.parent.params["range_"]
         self.alang = ctx.parent.params["alang"]
+        self.slang = ctx.parent.params["slang"]
 
         self.license_api = None
         self.client_grant = None
         self.auth_grant = None
         self.profile_id = None
+        self.manifest_params = None
 
         self.configure()
 
@@ -67,28 +73,21 @@ class HBOMax(BaseService):
         r = self.session.get(
             url=self.config["endpoints"]["manifest"].format(title_id=self.title),
             params={
-                "device-code": self.config["device"]["name"],
-                "product-code": "hboMax",
-                "api-version": "v9",
-                "country-code": "us",
-                "profile-type": "default",
+                **self.manifest_params,
                 "client-version": self.config["client"]["desktop"]["client_version"],
-                "signed-in": "true",
                 "content-space": "hboMaxSvodExperience"
             },
-            headers={
-                "Authorization": f"{self.auth_grant['token_type']} {self.auth_grant['access_token']}"
-            }
+            headers=self.get_auth_headers()
         )
         try:
             res = r.json()
         except json.JSONDecodeError:
             raise ValueError(f"Failed to load title manifest: {r.text}")
 
-        for i, e in enumerate(res):
-            res[i]["body"]["id"] = e["id"]
-            res[i] = res[i]["body"]
-        main_ref = self.map_references(next(x for x in res if x["id"] == self.title), res)
+        data = {}
+        for e in res:
+            data.setdefault(e["id"], dict(e["body"], id=e["id"]))
+        main_ref = self.map_references(data[self.title], data)
 
         if "message" in main_ref:
             raise self.log.exit(f" - Error from HBO MAX: {main_ref['message']}")
@@ -131,13 +130,14 @@ class HBOMax(BaseService):
                     source=self.ALIASES[0],
                     service_data=edit
                 )
-                for season in try_get(main_ref, lambda x: x["seasons"]["season"]) or [main_ref]
+                for season in main_ref.get("seasons", {}).get("season") or [main_ref]
                 for episode in season["episodes"]["episode"]
                 for edit in episode["edits"]["edit"]
             ]
 
     def get_tracks(self, title):
-        self.refresh()  # make sure the tokens are not expired
+        if not self.is_grant_valid(self.auth_grant):
+            self.refresh()
 
         if title.service_data.get("references"):
             # only want viewable reference, rest causes unnecessary requests if left in
@@ -145,41 +145,32 @@ class HBOMax(BaseService):
         else:
             title.service_data["references"] = {"viewable": title.service_data["id"]}
 
-        title.service_data = self.map_references(title.service_data, [], list_refs_only=False)
-        title_data = list(title.service_data["viewable"].values())[0][0]
+        title.service_data = self.map_references(title.service_data, {}, list_refs_only=False)
+        title_data = next(iter(title.service_data["viewable"].values()))[0]
         title_data["edits"] = sorted(
             title_data["edits"]["edit"],
             key=lambda e: is_close_match(e["originalAudioLanguage"], self.alang),
             reverse=True
         )
-        manifest = {}
-        for n, edit in enumerate(title_data["edits"]):
-            res = self.session.post(
-                url=self.config["endpoints"]["content"],
-                json=[
-                    {
-                        "id": edit["references"]["video"],
-                        "headers": {
-                            "x-hbo-device-model": self.session.headers["User-Agent"],
-                            "x-hbo-download-quality": "HIGHEST",
-                            "x-hbo-device-code-override": "DESKTOP",
-                            "x-hbo-video-encodes": f"{self.vcodec}|DASH|WDV"
-                        }
-                    }
-                ],
-                headers={
-                    "Authorization": f"{self.auth_grant['token_type']} {self.auth_grant['access_token']}"
-                }
-            ).json()[0]["body"]
-            if "manifests" not in res:
-                raise self.log.exit(f" - Failed! HBO MAX returned an error: {res['message']} [{res.get('code')}]")
-            res = res["manifests"]
-            res = [x for x in res if x["type"] == "urn:video:main"][0]
-            if n == 0:
-                manifest = res
-            else:
-                manifest["audioTracks"].extend(res["audioTracks"])
-                manifest["textTracks"].extend(res["textTracks"])
+        edits = title_data["edits"]
+        manifest = None
+        if self.slang and "all" not in self.slang and is_close_match(edits[0]["originalAudioLanguage"], self.alang):
+            # the wanted audio language has its own edit, the other edits would only add their subtitles,
+            # so they're only needed if this edit is missing one of the wanted subtitle languages
+            manifest = self.get_edit_manifest(edits[0])
+            edits = edits[1:]
+            sub_languages = [x["language"] for x in manifest["textTracks"]]
+            if all(is_close_match(language, sub_languages) for language in self.slang):
+                edits = []
+        edit_manifests = []
+        if edits:
+            with ThreadPoolExecutor(max_workers=min(8, len(edits))) as executor:
+                edit_manifests = list(executor.map(self.get_edit_manifest, edits))
+        if manifest is None:
+            manifest = edit_manifests.pop(0)
+        for edit_manifest in edit_manifests:
+            manifest["audioTracks"].extend(edit_manifest["audioTracks"])
+            manifest["textTracks"].extend(edit_manifest["textTracks"])
 
         self.license_api = manifest["drm"]["licenseUrl"]
 
@@ -190,10 +181,12 @@ class HBOMax(BaseService):
         )
 
         if self.vcodec:
-            tracks.videos = [x for x in tracks.videos if (x.codec or "")[:4] in self.VIDEO_CODEC_MAP[self.vcodec]]
+            video_codecs = self.VIDEO_CODEC_MAP[self.vcodec]
+            tracks.videos = [x for x in tracks.videos if (x.codec or "")[:4] in video_codecs]
 
         if self.acodec:
-            tracks.audios = [x for x in tracks.audios if (x.codec or "")[:4] == self.AUDIO_CODEC_MAP[self.acodec]]
+            audio_codec = self.AUDIO_CODEC_MAP[self.acodec]
+            tracks.audios = [x for x in tracks.audios if (x.codec or "")[:4] == audio_codec]
 
         if "textTracks" in manifest:
             for sub in manifest["textTracks"]:
@@ -205,7 +198,7 @@ class HBOMax(BaseService):
                     # CC tracks as per usual are actually SDH
                     sub["displayName"] += " (SDH)"
                 tracks.add(TextTrack(
-                    id_=md5(sub["url"].encode()).hexdigest()[0:6],
+                    id_=f"{zlib.crc32(sub['url'].encode()):08x}"[0:6],
                     source=self.ALIASES[0],
                     url=sub["url"],
                     # metadata
@@ -216,8 +209,8 @@ class HBOMax(BaseService):
         for track in tracks:
             track.needs_proxy = True
             if isinstance(track, VideoTrack):
-                codec = track.extra[0].get("codecs")
-                track.hdr10 = codec[0:4] in ("hvc1", "hev1") and codec[5] == "2"
+                codec = track.extra[0].get("codecs") or ""
+                track.hdr10 = codec[0:4] in ("hvc1", "hev1") and codec[5:6] == "2"
                 track.dv = codec[0:4] in ("dvh1", "dvhe")
 
         return tracks
@@ -235,9 +228,7 @@ class HBOMax(BaseService):
                 "keygen": "playready",
                 "drmKeyVersion": "2"
             },
-            headers={
-                "Authorization": f"{self.auth_grant['token_type']} {self.auth_grant['access_token']}"
-            },
+            headers=self.get_auth_headers(),
             data=challenge  # expects bytes
         ).content
 
@@ -250,11 +241,43 @@ class HBOMax(BaseService):
             "X-Hbo-Device-Name": self.config["device"]["name"],
             "X-Hbo-Device-Os-Version": self.config["device"]["os_version"]
         })
+        self.manifest_params = {
+            "device-code": self.config["device"]["name"],
+            "product-code": "hboMax",
+            "api-version": "v9",
+            "country-code": "us",
+            "profile-type": "default",
+            "signed-in": "true"
+        }
         if self.title.startswith("urn:hbo:feature:"):
             self.movie = True
         if not self.title.startswith("urn:"):
             self.title = f"urn:hbo:{'feature' if self.movie else 'series'}:{self.title}"
         self.log.info("Logging into HBO MAX")
+        if not self.credentials:
+            raise self.log.exit(" - No credentials provided, unable to log in.")
+        tokens_cache_path = self.get_cache(f"tokens_{self.credentials.sha1}.json")
+        try:
+            with open(tokens_cache_path, encoding="utf-8") as fd:
+                tokens = json.load(fd)
+        except (OSError, ValueError):
+            tokens = None
+        if tokens and self.is_grant_valid(tokens["client_grant"]):
+            self.client_grant = tokens["client_grant"]
+            self.auth_grant = tokens["auth_grant"]
+            self.profile_id = tokens["profile_id"]
+            refreshed = True
+            if self.is_grant_valid(self.auth_grant):
+                self.log.info(" + Using cached tokens...")
+            else:
+                try:
+                    self.refresh()
+                except (requests.HTTPError, SystemExit):
+                    self.log.warning(" - Failed to refresh cached tokens, logging in again...")
+                    refreshed = False
+            if refreshed:
+                self.log.info(f" + Using cached profile ID: {self.profile_id}")
+                return
         self.client_grant = self.get_client_token()
         self.log.info(
             " + Obtained client_grant grant token "
@@ -269,6 +292,28 @@ class HBOMax(BaseService):
         )
         self.profile_id = self.get_profile_id()
         self.log.info(f" + Obtained profile ID: {self.profile_id}")
+        self.save_tokens()
+
+    @staticmethod
+    def is_grant_valid(grant):
+        """Check if a grant token was issued (by this service code) and is not about to expire."""
+        return grant.get("issued_at", 0) + grant["expires_in"] - 60 > time.time()
+
+    def get_auth_headers(self):
+        """Get the Authorization header for HBO MAX API requests from the current user grant token."""
+        return {"Authorization": f"{self.auth_grant['token_type']} {self.auth_grant['access_token']}"}
+
+    def save_tokens(self):
+        """Save the grant tokens and profile ID to the cache so they can be used by later runs."""
+        tokens_cache_path = self.get_cache(f"tokens_{self.credentials.sha1}.json")
+        os.makedirs(os.path.dirname(tokens_cache_path), exist_ok=True)
+        with open(f"{tokens_cache_path}.tmp", "w", encoding="utf-8") as fd:
+            json.dump({
+                "client_grant": self.client_grant,
+                "auth_grant": self.auth_grant,
+                "profile_id": self.profile_id
+            }, fd)
+        os.replace(f"{tokens_cache_path}.tmp", tokens_cache_path)
 
     def get_client_token(self):
         r = self.session.post(
@@ -290,6 +335,7 @@ class HBOMax(BaseService):
             raise self.log.exit(f" - Failed to retrieve temp client token, response was not JSON: {res.text}")
         if "access_token" not in res:
             raise self.log.exit(f" - No access_token in temp client token response: {res}")
+        res["issued_at"] = int(time.time())
         return res
 
     def get_auth_grant(self):
@@ -315,6 +361,7 @@ class HBOMax(BaseService):
             raise self.log.exit(" - The profile's login credentials are invalid!")
         if "access_token" not in res:
             raise self.log.exit(f" - No access_token in auth grant token response: {res}")
+        res["issued_at"] = int(time.time())
         return res
 
     def get_profile_id(self):
@@ -323,7 +370,7 @@ class HBOMax(BaseService):
                 url=self.config["endpoints"]["content"],
                 json=[{"id": "urn:hbo:user:me"}],
                 headers={
-                    "Authorization": f"{self.auth_grant['token_type']} {self.auth_grant['access_token']}",
+                    **self.get_auth_headers(),
                     "X-Hbo-Client-Version": self.config["client"]["android"]["version"]
                 }
             ).json()
@@ -351,69 +398,97 @@ class HBOMax(BaseService):
             raise self.log.exit(f" - Failed to refresh access token, response was not JSON: {r.text}")
         if "access_token" not in res:
             raise self.log.exit(f" - No access_token in refresh response: {res}")
+        res["issued_at"] = int(time.time())
         self.auth_grant = res
         self.log.info(
             " + Refreshed user_name_password grant token "
             f"({self.auth_grant['token_type']} that expires in "
             f"{int(self.auth_grant['expires_in'] / 60)} minutes)"
         )
+        self.save_tokens()
+
+    def get_edit_manifest(self, edit):
+        """Get the main video manifest of an edit."""
+        res = self.session.post(
+            url=self.config["endpoints"]["content"],
+            json=[
+                {
+                    "id": edit["references"]["video"],
+                    "headers": {
+                        "x-hbo-device-model": self.session.headers["User-Agent"],
+                        "x-hbo-download-quality": "HIGHEST",
+                        "x-hbo-device-code-override": "DESKTOP",
+                        "x-hbo-video-encodes": f"{self.vcodec}|DASH|WDV"
+                    }
+                }
+            ],
+            headers=self.get_auth_headers()
+        ).json()[0]["body"]
+        if "manifests" not in res:
+            raise self.log.exit(f" - Failed! HBO MAX returned an error: {res['message']} [{res.get('code')}]")
+        return [x for x in res["manifests"] if x["type"] == "urn:video:main"][0]
 
     def map_references(self, root, data, list_refs_only=True):
         """
-        Recursively map a reference ID URN with its associated data.
+        Map reference ID URNs with their associated data, all the way down the reference tree.
 
         Parameters:
             root: The primary dictionary from the data parameter to use and return. This
                 should be the dictionary you intend to actually use. It can be as low or
                 high level nesting as you want, it doesn't care.
-            data: A list of dictionaries in which each dictionary should have an "id" key
-                reference ID URN that should contain the related data for that reference ID.
-                It should contain one dict per reference URN that is referenced in the
+            data: A dictionary mapping each reference ID URN to the dictionary of related
+                data for that reference ID (which should also have it under an "id" key).
+                It should contain one entry per reference URN that is referenced in the
                 `root` dictionary.
                 If data for a reference ID URN cannot be found, it will start a manifest
                 endpoint request for that reference ID URN and use its returned data.
+                The requests for all missing reference ID URNs of a reference table are
+                made concurrently.
         """
-        if root.get("references"):
-            for table_key, table_value in root["references"].copy().items():
+        nodes = [(root, list_refs_only)]
+        while nodes:
+            node, node_list_refs_only = nodes.pop()
+            references = node.get("references")
+            if not references:
+                continue
+            for table_key in list(references):
+                table_value = references[table_key]
                 if not isinstance(table_value, list):
-                    if list_refs_only:
+                    if node_list_refs_only:
                         # most likely not a reference needing to be mapped (yet)
                         # these tend to begin a large list of more data to be mapped that goes TOO deep
                         # if that's the case, map references with list_refs_only=True, then list_refs_only=False
-                        # one deep-nested dict object (so that there's way less recursion to do, but same result).
+                        # one deep-nested dict object (so that there's way less nesting to do, but same result).
                         continue
                     else:
                         table_value = [table_value]
-                if not root.get(table_key):
-                    root[table_key] = {}
+                del references[table_key]
+                if not node.get(table_key):
+                    node[table_key] = {}
+                table_value = list(dict.fromkeys(table_value))  # duplicate references would be listed twice
+                missing = [ref_id for ref_id in table_value if ref_id not in data]
+                if missing:
+                    with ThreadPoolExecutor(max_workers=min(8, len(missing))) as executor:
+                        for res in executor.map(self.get_reference_data, missing):
+                            for x in res:
+                                data.setdefault(x["id"], x)
                 for ref_id in table_value:
                     ref_key = ref_id.split(":")[2].replace("-", "_")
-                    if not root[table_key].get(ref_key):
-                        root[table_key][ref_key] = []
-                    ref_data = next((x for x in data if x["id"] == ref_id), {})
-                    if not ref_data:
-                        res = self.session.get(
-                            url=self.config["endpoints"]["manifest"].format(title_id=ref_id),
-                            params={
-                                "device-code": self.config["device"]["name"],
-                                "product-code": "hboMax",
-                                "api-version": "v9",
-                                "country-code": "us",
-                                "profile-type": "default",
-                                "signed-in": "true"
-                            },
-                            headers={
-                                "Authorization": f"{self.auth_grant['token_type']} {self.auth_grant['access_token']}"
-                            }
-                        ).json()
-                        for i, e in enumerate(res):
-                            res[i]["body"]["id"] = e["id"]
-                            res[i] = res[i]["body"]
-                        data.extend(res)
-                        ref_data = next(x for x in res if x["id"] == ref_id)
-                    ref_data = self.map_references(ref_data, data)
-                    root[table_key][ref_key].append(ref_data)
-                del root["references"][table_key]
-            if not root["references"]:
-                del root["references"]
+                    if not node[table_key].get(ref_key):
+                        node[table_key][ref_key] = []
+                    ref_data = data[ref_id]
+                    node[table_key][ref_key].append(ref_data)
+                    # the referenced data's own references are mapped later on, in place
+                    nodes.append((ref_data, True))
+            if not references:
+                del node["references"]
         return root
+
+    def get_reference_data(self, ref_id):
+        """Get the data for a reference ID URN, along with any other data the manifest endpoint returns."""
+        res = self.session.get(
+            url=self.config["endpoints"]["manifest"].format(title_id=ref_id),
+            params=self.manifest_params,
+            headers=self.get_auth_headers()
+        ).json()
+        return [dict(e["body"], id=e["id"]) for e in res]
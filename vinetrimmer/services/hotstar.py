@@ -7,7 +7,6 @@ import time
 import uuid
 import requests
 from urllib.parse import urlparse, parse_qs
-from urllib.request import urlopen, Request
 
 import click
 
@@ -15,6 +14,44 @@ from vinetrimmer.objects import Title, Tracks
 from vinetrimmer.services.BaseService import BaseService
 
 
+# TODO: Perhaps set up desired-config to actual desired playback set values?
+DESIRED_CONFIG = "|".join([
+    "audio_channel:stereo",
+    "dynamic_range:hdr10",
+    "encryption:widevine",
+    "ladder:tv",
+    "package:dash",
+    "resolution:fhd",
+    "video_codec:h264"
+])
+
+PLAYBACK_REQUEST = {
+    "os_name": "Windows",
+    "os_version": "10",
+    "app_name": "web",
+    "app_version": "7.34.1",
+    "platform": "Chrome",
+    "platform_version": "99.0.4844.82",
+    "client_capabilities": {
+        "ads": ["non_ssai"],
+        "audio_channel": ["stereo"],
+        "dvr": ["short"],
+        "package": ["dash", "hls"],
+        "dynamic_range": ["sdr"],
+        "video_codec": ["h264"],
+        "encryption": ["widevine"],
+        "ladder": ["tv"],
+        "container": ["fmp4"],
+        "resolution": ["hd"]
+    },
+    "drm_parameters": {
+        "widevine_security_level": ["SW_SECURE_DECODE", "SW_SECURE_CRYPTO"],
+        "hdcp_version": ["HDCP_V2_2", "HDCP_V2_1", "HDCP_V2", "HDCP_V1"]
+    },
+    "resolution": "auto"
+}
+
+
 class Hotstar(BaseService):
     """
     Service code for Star India's Hotstar (aka Disney+ Hotstar) streaming service (https://hotstar.com).
@@ -86,7 +123,7 @@ class Hotstar(BaseService):
         try:
             res = r.json()["body"]["results"]["item"]
         except json.JSONDecodeError:
-            raise ValueError(f"Failed to load title manifest: {res.text}")
+            raise ValueError(f"Failed to load title manifest: {r.text}")
 
         if res["assetType"] == "MOVIE":
             return Title(
@@ -132,16 +169,7 @@ class Hotstar(BaseService):
             r = self.session.post(
                 url=self.config["endpoints"]["manifest"].format(id=title.service_data["contentId"]),
                 params={
-                    # TODO: Perhaps set up desired-config to actual desired playback set values?
-                    "desired-config": "|".join([
-                        "audio_channel:stereo",
-                        "dynamic_range:hdr10",
-                        "encryption:widevine",
-                        "ladder:tv",
-                        "package:dash",
-                        "resolution:fhd",
-                        "video_codec:h264"
-                    ]),
+                    "desired-config": DESIRED_CONFIG,
                     "device-id": self.device_id,
                 },
                 headers={
@@ -151,31 +179,7 @@ class Hotstar(BaseService):
                     "x-hs-request-id": self.device_id,
                     "x-country-code": "in"
                 },
-                json={
-                    "os_name": "Windows",
-                    "os_version": "10",
-                    "app_name": "web",
-                    "app_version": "7.34.1",
-                    "platform": "Chrome",
-                    "platform_version": "99.0.4844.82",
-                    "client_capabilities": {
-                        "ads": ["non_ssai"],
-                        "audio_channel": ["stereo"],
-                        "dvr": ["short"],
-                        "package": ["dash", "hls"],
-                        "dynamic_range": ["sdr"],
-                        "video_codec": ["h264"],
-                        "encryption": ["widevine"],
-                        "ladder": ["tv"],
-                        "container": ["fmp4"],
-                        "resolution": ["hd"]
-                    },
-                    "drm_parameters": {
-                        "widevine_security_level": ["SW_SECURE_DECODE", "SW_SECURE_CRYPTO"],
-                        "hdcp_version": ["HDCP_V2_2", "HDCP_V2_1", "HDCP_V2", "HDCP_V1"]
-                    },
-                    "resolution": "auto"
-                }
+                json=PLAYBACK_REQUEST
             )
             try:
                 playback_sets = r.json()["data"]["playback_sets"]
@@ -185,7 +189,7 @@ class Hotstar(BaseService):
             # transform tagsCombination into `tags` key-value dictionary for easier usage
             playback_sets = [dict(
                 **x,
-                tags=dict(y.split(":") for y in x["tags_combination"].lower().split(";"))
+                tags=dict(y.partition(":")[::2] for y in x["tags_combination"].lower().split(";"))
             ) for x in playback_sets]
 
             playback_set = next((
@@ -215,9 +219,10 @@ class Hotstar(BaseService):
             if playback_set['token_algorithm'] == 'AKAMAI-HMAC':
                 akamai_cdn = False
 
-        r = Request(playback_set["playback_url"])
-        r.add_header("user-agent", "Hotstar;in.startv.hotstar/3.3.0 (Android/8.1.0)")
-        data = urlopen(r).read()
+        data = self.session.get(
+            url=playback_set["playback_url"],
+            headers={"User-Agent": "Hotstar;in.startv.hotstar/3.3.0 (Android/8.1.0)"}
+        ).content
 
         mpd_url = playback_set["playback_url"].replace(".hotstar.com", ".akamaized.net")
 
@@ -293,13 +298,15 @@ class Hotstar(BaseService):
     @staticmethod
     def save_token(token, to):
         # Decode the JWT data component
-        data = json.loads(base64.b64decode(token.split(".")[1] + "===").decode("utf-8"))
+        payload = token.split(".")[1]
+        data = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
         data["uid"] = token
         data["sub"] = json.loads(data["sub"])
 
         os.makedirs(os.path.dirname(to), exist_ok=True)
-        with open(to, "w", encoding="utf-8") as fd:
+        with open(f"{to}.tmp", "w", encoding="utf-8") as fd:
             json.dump(data, fd)
+        os.replace(f"{to}.tmp", to)
 
         return token
 
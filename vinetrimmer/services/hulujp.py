@@ -1,10 +1,10 @@
-import hashlib
 import json
 import os
 import re
-import sys
 import time
 import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 import requests
@@ -13,6 +13,14 @@ from vinetrimmer.objects import Title, TextTrack, Tracks
 from vinetrimmer.services.BaseService import BaseService
 
 
+APP_STATE_RE = re.compile(r"window\.app=({.+?});</script>")
+SUBTITLE_KEYS = [
+    (sub_lang, sub_type, f"caption_{sub_lang}_{sub_type}_standard")
+    for sub_lang in ("en", "ja")
+    for sub_type in ("normal", "forced", "cc")
+]
+
+
 class HuluJP(BaseService):
     """
     Service code for the Hulu Japan streaming service (https://hulu.jp).
@@ -55,18 +63,18 @@ class HuluJP(BaseService):
         self.configure()
 
     def get_titles(self):
-        src = requests.get(
+        src = self.session.get(
             url=f"https://www.hulu.jp/{self.title}",
             headers={
                 "User-Agent": self.config["user_agent_browser"]
             }
         ).text
-        match = re.search(r"window\.app=({.+);</script>", src, re.MULTILINE)
+        match = APP_STATE_RE.search(src)
 
         if not match:
             raise self.log.exit(" - Failed to falcorCache data, check the slug.")
         falcor_cache_raw = match.group(1)
-        falcor_cache = json.loads(re.sub(r"\\x", r"\\u00", falcor_cache_raw))['falcorCache']
+        falcor_cache = json.loads(falcor_cache_raw.replace("\\x", "\\u00"))['falcorCache']
 
         meta_id = next(iter(falcor_cache['titleSlug'].values()))["value"][1]
 
@@ -79,16 +87,11 @@ class HuluJP(BaseService):
 
         titles = []
 
-        for season in series_metas["seasons"]:
-            metas = self.session.get(
-                url=self.config["endpoints"]["metas_children"].format(id=season["id"]),
-                params={
-                    **self.config["common_params"],
-                    **self.config["meta_params"],
-                    **self.config["search_params"],
-                }
-            ).json()["metas"]
+        seasons = series_metas["seasons"]
+        with ThreadPoolExecutor(max_workers=max(min(8, len(seasons)), 1)) as executor:
+            season_metas = list(executor.map(self.get_season_metas, seasons))
 
+        for metas in season_metas:
             titles += [Title(
                 id_=meta["meta_id"],
                 type_=Title.Types.TV,
@@ -121,13 +124,7 @@ class HuluJP(BaseService):
             if e.response.status_code == 403 and not retrying:
                 # 60 seconds appears to be the magic number to get requests to work again
                 self.log.warning(" - Possible rate limit, retrying after 60 seconds.")
-
-                for remaining in range(60, 0, -1):
-                    sys.stdout.write("\r")
-                    sys.stdout.write("{:02d} seconds remaining.".format(remaining))
-                    sys.stdout.flush()
-                    time.sleep(1)
-
+                time.sleep(60)
                 return self.get_tracks(title, retrying=True)
             else:
                 raise
@@ -159,20 +156,20 @@ class HuluJP(BaseService):
             source="HULU",
         )
 
-        for sub_lang in ["en", "ja"]:
-            for sub_type in ["normal", "forced", "cc"]:
-                sub_url = auth["media"]["values"].get(f"caption_{sub_lang}_{sub_type}_standard")
-                if sub_url:
-                    tracks.add(TextTrack(
-                        id_=hashlib.md5(sub_url.encode()).hexdigest()[0:6],
-                        source="HULU",
-                        url=sub_url,
-                        # metadata
-                        codec="vtt",
-                        language=sub_lang,
-                        forced=sub_type == "forced",
-                        sdh=sub_type == "cc",
-                    ))
+        media_values = auth["media"]["values"]
+        for sub_lang, sub_type, sub_key in SUBTITLE_KEYS:
+            sub_url = media_values.get(sub_key)
+            if sub_url:
+                tracks.add(TextTrack(
+                    id_=f"{zlib.crc32(sub_url.encode()):08x}"[0:6],
+                    source="HULU",
+                    url=sub_url,
+                    # metadata
+                    codec="vtt",
+                    language=sub_lang,
+                    forced=sub_type == "forced",
+                    sdh=sub_type == "cc",
+                ))
 
         return tracks
 
@@ -210,6 +207,16 @@ class HuluJP(BaseService):
             "Content-Type": "application/json; charset=utf-8",
         })
 
+    def get_season_metas(self, season):
+        return self.session.get(
+            url=self.config["endpoints"]["metas_children"].format(id=season["id"]),
+            params={
+                **self.config["common_params"],
+                **self.config["meta_params"],
+                **self.config["search_params"],
+            }
+        ).json()["metas"]
+
     def get_tokens(self):
         session_data = self.session.get(
             url=self.config["endpoints"]["session_create"],
@@ -258,7 +265,8 @@ class HuluJP(BaseService):
             ).json()
 
             os.makedirs(os.path.dirname(tokens_cache_path), exist_ok=True)
-            with open(tokens_cache_path, "w", encoding="utf-8") as fd:
+            with open(f"{tokens_cache_path}.tmp", "w", encoding="utf-8") as fd:
                 json.dump(tokens, fd)
+            os.replace(f"{tokens_cache_path}.tmp", tokens_cache_path)
 
         return tokens
@@ -14,6 +14,12 @@ from vinetrimmer.services.BaseService import BaseService
 from vinetrimmer.vendor.pymp4.parser import Box
 
 
+SHOEBOX_RE = re.compile(r'id="shoebox-ember-data-store">(.+?)</script>')
+BITRATE_RE = re.compile(r"(?:_gr|&g=)(\d+?)(?:[&-])")
+ITUNES_URL_RE = re.compile(r"https?://(?:geo\.)?itunes\.apple\.com/")
+ENVIRONMENT_RE = re.compile(r'web-tv-app/config/environment"[\s\S]*?content="([^"]+)')
+
+
 class iTunes(BaseService):
     """
     Service code for Apple's VOD streaming service (https://itunes.apple.com).
@@ -65,7 +71,7 @@ class iTunes(BaseService):
                 'User-Agent': self.config["user_agent_browser"]
             }
         )
-        match = re.search('id="shoebox-ember-data-store">(.+?)</script>', res.text)
+        match = SHOEBOX_RE.search(res.text)
         if not match:
             raise ValueError("Failed to find stream data in webpage.")
 
@@ -145,7 +151,7 @@ class iTunes(BaseService):
                 track.encrypted = True
             if isinstance(track, AudioTrack):
                 track.encrypted = True
-                bitrate = re.search(r"(?:_gr|&g=)(\d+?)(?:[&-])", track.extra.uri)
+                bitrate = BITRATE_RE.search(track.extra.uri)
                 if bitrate:
                     track.bitrate = int(bitrate[1][-3::]) * 1000  # e.g. 128->128,000, 2448->448,000
                 else:
@@ -214,7 +220,7 @@ class iTunes(BaseService):
     # Service specific functions
 
     def configure(self):
-        if not re.match(r"https?://(?:geo\.)?itunes\.apple\.com/", self.title):
+        if not ITUNES_URL_RE.match(self.title):
             raise ValueError("Url must be an iTunes URL...")
 
         environment = self.get_environment_config()
@@ -279,7 +285,7 @@ class iTunes(BaseService):
     def get_environment_config(self):
         """Loads environment config data from WEB App's <meta> tag."""
         res = self.session.get("https://tv.apple.com").text
-        env = re.search(r'web-tv-app/config/environment"[\s\S]*?content="([^"]+)', res)
+        env = ENVIRONMENT_RE.search(res)
         if not env:
             return None
         return json.loads(unquote(env[1]))
@@ -10,6 +10,9 @@ from vinetrimmer.services.BaseService import BaseService
 from vinetrimmer.utils.xml import load_xml
 
 
+BEARER_RE = re.compile(r'"Authorization": ?"Bearer ([^\"]+)')
+
+
 class ParamountPlus(BaseService):
     """
     Service code for Paramount's Paramount+ streaming service (https://paramountplus.com).
@@ -304,9 +307,11 @@ class ParamountPlus(BaseService):
     # Service specific functions
 
     def get_prop(self, prop):
-        r = self.session.get("https://www.paramountplus.com")
+        text = self.session.get("https://www.paramountplus.com").text
         prop_re = prop.replace(".", r"\.")
-        search = re.search(rf"{prop_re} ?= ?[\"']?([^\"';]+)", r.text)
+        # a match can only start at an occurrence of the prop, so skip the page up to its first one
+        start = text.find(prop)
+        search = start >= 0 and re.compile(rf"{prop_re} ?= ?[\"']?([^\"';]+)").search(text, start)
         if not search:
             raise self.log.exit(f" - Could not find {prop} prop on Paramount+ homepage. Cookies may be expired.")
         return search.group(1)
@@ -318,8 +323,9 @@ class ParamountPlus(BaseService):
         return self.get_prop("CBS.Registry.user.sub_status") == "SUBSCRIBER"
 
     def get_auth_bearer(self, path):
-        r = self.session.get(urllib.parse.urljoin("https://www.paramountplus.com", path))
-        match = re.search(r'"Authorization": ?"Bearer ([^\"]+)', r.text)
+        text = self.session.get(urllib.parse.urljoin("https://www.paramountplus.com", path)).text
+        start = text.find('"Authorization"')
+        match = start >= 0 and BEARER_RE.search(text, start)
         if not match:
             if not path.endswith("/*"):
                 # Hack to get video player page when the API returns a wrong path
@@ -1,5 +1,8 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 from datetime import datetime
 
@@ -33,15 +36,20 @@ def main(debug):
     logging.Logger.exit = log_exit
 
     os.makedirs(directories.logs, exist_ok=True)
+    # write the log file from a background thread, records are formatted by the QueueHandler before being queued
+    log_queue = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(log_queue, logging.FileHandler(
+        os.path.join(directories.logs, filenames.log.format(time=datetime.now().strftime("%Y%m%d-%H%M%S"))),
+        encoding='utf-8'
+    ))
+    log_listener.start()
+    atexit.register(log_listener.stop)
     logging.basicConfig(
         level=logging.DEBUG,
         format=LOG_FORMAT,
         datefmt=LOG_DATE_FORMAT,
         style=LOG_STYLE,
-        handlers=[logging.FileHandler(
-            os.path.join(directories.logs, filenames.log.format(time=datetime.now().strftime("%Y%m%d-%H%M%S"))),
-            encoding='utf-8'
-        )]
+        handlers=[logging.handlers.QueueHandler(log_queue)]
     )
 
     coloredlogs.install(